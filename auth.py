@@ -3,10 +3,9 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from typing import Optional
 from database import SessionLocal
-from models import User
+from models import User, check_password, hash_password
 import logging
 
 # Configure logging
@@ -16,9 +15,6 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT settings
 SECRET_KEY = "your-secret-key-here"  # Change this to a secure secret key
 ALGORITHM = "HS256"
@@ -35,11 +31,12 @@ def get_db():
     finally:
         db.close()
 
+# Password hashing shares the native bcrypt helpers in models.py
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return check_password(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password(password)
 
 def authenticate_user(db: Session, username: str, password: str):
     # Try to find user by email first
@@ -1,5 +1,5 @@
+from sqlalchemy import text
 from database import SessionLocal
-from models import Question
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -8,19 +8,22 @@ logger = logging.getLogger(__name__)
 def check_database():
     db = SessionLocal()
     try:
-        # Count total questions
-        total_questions = db.query(Question).count()
-        logger.info(f"Total questions in database: {total_questions}")
+        # Fetch per-table counts and a sample question in a single round-trip
+        row = db.execute(text("""
+            SELECT (SELECT count(*) FROM questions) AS questions,
+                   (SELECT count(*) FROM users) AS users,
+                   (SELECT question_text FROM questions LIMIT 1) AS sample
+        """)).one()
+        logger.info("Total questions in database: %s", row.questions)
+        logger.info("Total users in database: %s", row.users)
         
-        # Get a sample question
-        sample_question = db.query(Question).first()
-        if sample_question:
-            logger.info(f"Sample question: {sample_question.question_text}")
+        if row.sample is not None:
+            logger.info("Sample question: %s", row.sample)
         else:
             logger.info("No questions found in database")
             
     except Exception as e:
-        logger.error(f"Error checking database: {str(e)}")
+        logger.error("Error checking database: %s", e)
     finally:
         db.close()
 
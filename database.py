@@ -95,6 +95,247 @@ def add_timestamp_columns():
         logger.error(f"Error adding timestamp columns: {str(e)}")
         raise
 
+def convert_correct_answer_to_char():
+    """Store questions.correct_answer as fixed-width CHAR(1)"""
+    try:
+        with engine.begin() as conn:
+            # Check if correct_answer is still a varchar column
+            result = conn.execute(text("""
+                SELECT data_type 
+                FROM information_schema.columns 
+                WHERE table_name = 'questions' AND column_name = 'correct_answer'
+            """))
+            row = result.fetchone()
+            if row and row[0] != 'character':
+                conn.execute(text("""
+                    ALTER TABLE questions 
+                    ALTER COLUMN correct_answer TYPE CHAR(1) USING upper(trim(correct_answer))::CHAR(1)
+                """))
+                logger.info("Converted correct_answer column to CHAR(1)")
+    except Exception as e:
+        logger.error(f"Error converting correct_answer column: {str(e)}")
+        raise
+
+def create_question_indexes():
+    """Add the composite filter indexes to an existing questions table"""
+    try:
+        with engine.begin() as conn:
+            # Fresh databases get these indexes from create_all
+            result = conn.execute(text("SELECT to_regclass('questions')"))
+            if result.scalar() is not None:
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_q_exam_subj_year 
+                    ON questions (exam_type, exam_stage, subject, year) 
+                    INCLUDE (correct_answer, difficulty_level)
+                """))
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_q_subject_year 
+                    ON questions (subject, year)
+                """))
+                logger.info("Ensured question filter indexes exist")
+    except Exception as e:
+        logger.error(f"Error creating question indexes: {str(e)}")
+        raise
+
+def set_question_timestamp_defaults():
+    """Let the database stamp questions.created_at/updated_at"""
+    try:
+        with engine.begin() as conn:
+            # Only ALTER (and take its ACCESS EXCLUSIVE lock) when a default differs
+            result = conn.execute(text("""
+                SELECT column_default 
+                FROM information_schema.columns 
+                WHERE table_name = 'questions' AND column_name IN ('created_at', 'updated_at')
+            """))
+            defaults = [row[0] for row in result.fetchall()]
+            if defaults and any(d != "timezone('utc'::text, now())" for d in defaults):
+                conn.execute(text("""
+                    ALTER TABLE questions 
+                    ALTER COLUMN created_at SET DEFAULT timezone('utc', now()), 
+                    ALTER COLUMN updated_at SET DEFAULT timezone('utc', now())
+                """))
+                logger.info("Set server defaults on question timestamp columns")
+    except Exception as e:
+        logger.error(f"Error setting question timestamp defaults: {str(e)}")
+        raise
+
+def convert_enum_column_to_smallint(table: str, column: str, enum_class):
+    """Convert an enum/varchar column to SMALLINT holding the 1-based member ordinal"""
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(text("""
+                SELECT data_type, udt_name 
+                FROM information_schema.columns 
+                WHERE table_name = :table AND column_name = :column
+            """), {"table": table, "column": column})
+            row = result.fetchone()
+            if row and row[0] != 'smallint':
+                data_type, udt_name = row
+                # Existing rows may hold either the member name or its value
+                labels = {}
+                for member_id, member in enumerate(enum_class, start=1):
+                    labels[member.name] = member_id
+                    labels[member.value] = member_id
+                result = conn.execute(text(f"""
+                    SELECT count(*) FROM {table} 
+                    WHERE {column} IS NOT NULL AND NOT ({column}::text = ANY(:labels))
+                """), {"labels": list(labels)})
+                unmapped = result.scalar()
+                if unmapped:
+                    raise RuntimeError(
+                        f"{unmapped} rows in {table}.{column} match no {enum_class.__name__} member"
+                    )
+                cases = " ".join(
+                    f"WHEN {column}::text = '{label}' THEN {member_id}"
+                    for label, member_id in labels.items()
+                )
+                conn.execute(text(f"""
+                    ALTER TABLE {table} 
+                    ALTER COLUMN {column} TYPE SMALLINT USING (CASE {cases} END)
+                """))
+                logger.info(f"Converted {table}.{column} to SMALLINT")
+
+                # Drop the Postgres ENUM type once nothing else uses it
+                if data_type == 'USER-DEFINED':
+                    result = conn.execute(text("""
+                        SELECT count(*) 
+                        FROM information_schema.columns 
+                        WHERE udt_name = :udt_name
+                    """), {"udt_name": udt_name})
+                    if result.scalar() == 0:
+                        conn.execute(text(f'DROP TYPE IF EXISTS "{udt_name}"'))
+                        logger.info(f"Dropped enum type {udt_name}")
+    except Exception as e:
+        logger.error(f"Error converting {table}.{column} to SMALLINT: {str(e)}")
+        raise
+
+def create_question_statistics_view():
+    """Create question_statistics as a materialized view aggregated from user_progress"""
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(text("""
+                SELECT to_regclass('user_progress'), 
+                       (SELECT relkind FROM pg_class WHERE relname = 'question_statistics')
+            """))
+            progress_table, stats_kind = result.fetchone()
+            if stats_kind == 'r':
+                logger.warning("question_statistics is a regular table; not replacing it with a view")
+            elif progress_table is not None and stats_kind is None:
+                conn.execute(text("""
+                    CREATE MATERIALIZED VIEW question_statistics AS
+                    SELECT question_id, 
+                           count(*) AS total_attempts, 
+                           sum(is_correct::int) AS correct_attempts, 
+                           avg(time_taken)::bigint AS average_time, 
+                           max(attempted_at) AS last_updated
+                    FROM user_progress
+                    GROUP BY question_id
+                    WITH DATA
+                """))
+                # A unique index is required for REFRESH ... CONCURRENTLY
+                conn.execute(text("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS ix_question_statistics_question_id 
+                    ON question_statistics (question_id)
+                """))
+                logger.info("Created question_statistics materialized view")
+    except Exception as e:
+        logger.error(f"Error creating question_statistics view: {str(e)}")
+        raise
+
+def try_acquire_question_statistics_lock(conn) -> bool:
+    """Elect this worker to refresh question_statistics.
+
+    Takes a session-level advisory lock that stays held until conn is closed,
+    so exactly one uvicorn worker refreshes per cycle. Another worker takes
+    over when the holder's connection goes away.
+    """
+    result = conn.execute(text("""
+        SELECT pg_try_advisory_lock(hashtext('refresh_question_statistics'))
+    """))
+    return bool(result.scalar())
+
+def refresh_question_statistics():
+    """Refresh question_statistics without blocking readers"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY question_statistics"))
+        logger.info("Refreshed question_statistics")
+    except Exception as e:
+        logger.error(f"Error refreshing question_statistics: {str(e)}")
+        raise
+
+def drop_question_statistics_view(conn):
+    """Drop the question_statistics materialized view so user_progress columns can be retyped"""
+    result = conn.execute(text("""
+        SELECT relkind FROM pg_class WHERE relname = 'question_statistics'
+    """))
+    if result.scalar() == 'm':
+        conn.execute(text("DROP MATERIALIZED VIEW question_statistics"))
+
+def convert_time_taken_to_ms():
+    """Store user_progress.time_taken as integer milliseconds instead of float seconds"""
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(text("""
+                SELECT data_type 
+                FROM information_schema.columns 
+                WHERE table_name = 'user_progress' AND column_name = 'time_taken'
+            """))
+            row = result.fetchone()
+            if row and row[0] == 'double precision':
+                # The statistics view depends on the column; it is recreated at startup
+                drop_question_statistics_view(conn)
+                conn.execute(text("""
+                    ALTER TABLE user_progress 
+                    ALTER COLUMN time_taken TYPE INTEGER USING round(time_taken * 1000)::integer
+                """))
+                logger.info("Converted time_taken column to milliseconds")
+    except Exception as e:
+        logger.error(f"Error converting time_taken column: {str(e)}")
+        raise
+
+def convert_is_correct_to_boolean():
+    """Store user_progress.is_correct as a 1-byte BOOLEAN instead of a 0/1 integer"""
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(text("""
+                SELECT data_type 
+                FROM information_schema.columns 
+                WHERE table_name = 'user_progress' AND column_name = 'is_correct'
+            """))
+            row = result.fetchone()
+            if row and row[0] == 'integer':
+                # The statistics view depends on the column; it is recreated at startup
+                drop_question_statistics_view(conn)
+                conn.execute(text("""
+                    ALTER TABLE user_progress 
+                    ALTER COLUMN is_correct TYPE BOOLEAN USING is_correct::boolean
+                """))
+                logger.info("Converted is_correct column to BOOLEAN")
+    except Exception as e:
+        logger.error(f"Error converting is_correct column: {str(e)}")
+        raise
+
+def add_user_progress_unique_constraint():
+    """Add uq_user_q to an existing user_progress table; upserts rely on it"""
+    try:
+        with engine.begin() as conn:
+            # Fresh databases get the constraint from create_all
+            result = conn.execute(text("""
+                SELECT to_regclass('user_progress'), 
+                       EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_user_q')
+            """))
+            progress_table, has_constraint = result.fetchone()
+            if progress_table is not None and not has_constraint:
+                conn.execute(text("""
+                    ALTER TABLE user_progress 
+                    ADD CONSTRAINT uq_user_q UNIQUE (user_id, question_id)
+                """))
+                logger.info("Added uq_user_q constraint to user_progress")
+    except Exception as e:
+        logger.error(f"Error adding user_progress unique constraint: {str(e)}")
+        raise
+
 # Make username column nullable
 try:
     modify_username_column()
@@ -106,3 +347,39 @@ try:
     add_timestamp_columns()
 except Exception as e:
     logger.error(f"Error in add_timestamp_columns: {str(e)}")
+
+# Store correct_answer as CHAR(1)
+try:
+    convert_correct_answer_to_char()
+except Exception as e:
+    logger.error(f"Error in convert_correct_answer_to_char: {str(e)}")
+
+# Add composite indexes on questions filters
+try:
+    create_question_indexes()
+except Exception as e:
+    logger.error(f"Error in create_question_indexes: {str(e)}")
+
+# Move question timestamp defaults to the server
+try:
+    set_question_timestamp_defaults()
+except Exception as e:
+    logger.error(f"Error in set_question_timestamp_defaults: {str(e)}")
+
+# Store time_taken as integer milliseconds
+try:
+    convert_time_taken_to_ms()
+except Exception as e:
+    logger.error(f"Error in convert_time_taken_to_ms: {str(e)}")
+
+# Store is_correct as BOOLEAN
+try:
+    convert_is_correct_to_boolean()
+except Exception as e:
+    logger.error(f"Error in convert_is_correct_to_boolean: {str(e)}")
+
+# Enforce one user_progress row per user/question
+try:
+    add_user_progress_unique_constraint()
+except Exception as e:
+    logger.error(f"Error in add_user_progress_unique_constraint: {str(e)}")
@@ -5,7 +5,11 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Dict
 import models
 import schemas
-from database import SessionLocal, engine, Base
+from database import (
+    SessionLocal, engine, Base, convert_enum_column_to_smallint,
+    create_question_statistics_view, refresh_question_statistics,
+    try_acquire_question_statistics_lock
+)
 from auth import create_access_token, get_current_user, router as auth_router
 from datetime import datetime, timedelta
 import logging
@@ -21,6 +25,7 @@ import requests
 from together import Together
 from dotenv import load_dotenv
 import time
+import asyncio
 
 # Load environment variables
 load_dotenv()
@@ -48,6 +53,16 @@ class ChatResponse(BaseModel):
     response: str
     chat_id: str
 
+# Store question enum columns as SMALLINT ordinals. Failures are fatal: the
+# models bind integers, so the app must not run against the old column types
+for column, enum_class in [
+    ("exam_type", models.ExamType),
+    ("exam_stage", models.ExamStage),
+    ("subject", models.Subject),
+    ("difficulty_level", models.DifficultyLevel),
+]:
+    convert_enum_column_to_smallint("questions", column, enum_class)
+
 # Create database tables
 try:
     Base.metadata.create_all(bind=engine)
@@ -56,6 +71,15 @@ except Exception as e:
     logger.error(f"Error creating database tables: {str(e)}")
     logger.error(traceback.format_exc())
 
+# Aggregate question statistics from user_progress instead of per-attempt counter updates
+try:
+    create_question_statistics_view()
+except Exception as e:
+    logger.error(f"Error in create_question_statistics_view: {str(e)}")
+
+# Staleness bound for question_statistics, in seconds
+QUESTION_STATS_REFRESH_SECONDS = int(os.getenv("QUESTION_STATS_REFRESH_SECONDS", "300"))
+
 app = FastAPI()
 
 # Configure CORS
@@ -145,14 +169,14 @@ async def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Username must be at least 3 characters long")
         
         # Check if email exists
-        db_user = db.query(models.User).filter(models.User.email == user.email).first()
+        db_user = db.query(models.User.id).filter(models.User.email == user.email).first()
         if db_user:
             logger.warning(f"Email {user.email} already exists")
             raise HTTPException(status_code=400, detail="Email already registered")
             
         # Check if username exists
         if user.username:
-            db_user = db.query(models.User).filter(models.User.username == user.username).first()
+            db_user = db.query(models.User.id).filter(models.User.username == user.username).first()
             if db_user:
                 logger.warning(f"Username {user.username} already exists")
                 raise HTTPException(status_code=400, detail="Username already taken")
@@ -196,12 +220,15 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     try:
         # Try to find user by email first
         user = db.query(models.User).filter(models.User.email == form_data.username).first()
-        if not user or not user.verify_password(form_data.password):
+        if not user or not await user.verify_password_async(form_data.password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        # Persist a password hash upgraded during verification
+        if user in db.dirty:
+            db.commit()
         access_token = create_access_token(data={"sub": user.email})
         return {"access_token": access_token, "token_type": "bearer"}
     except Exception as e:
@@ -251,7 +278,7 @@ async def get_questions(filters: QuestionFilters):
         
         if filters.exam_type:
             query += " AND exam_type = :exam_type"
-            params['exam_type'] = filters.exam_type
+            params['exam_type'] = models.EXAM_TYPE.to_id(filters.exam_type)
         
         if filters.has_diagram is not None:
             query += " AND has_diagram = :has_diagram"
@@ -268,7 +295,7 @@ async def get_questions(filters: QuestionFilters):
         
         if filters.subject:
             query += " AND subject = :subject"
-            params['subject'] = filters.subject
+            params['subject'] = models.SUBJECT.to_id(filters.subject)
             
         if filters.year:
             query += " AND year = :year"
@@ -276,7 +303,7 @@ async def get_questions(filters: QuestionFilters):
             
         if filters.exam_stage:
             query += " AND exam_stage = :exam_stage"
-            params['exam_stage'] = filters.exam_stage
+            params['exam_stage'] = models.EXAM_STAGE.to_id(filters.exam_stage)
         
         # Add limit and randomize
         query += " ORDER BY RANDOM() LIMIT :limit"
@@ -303,12 +330,12 @@ async def get_questions(filters: QuestionFilters):
                     "correct_answer": q.correct_answer,
                     "explanation": q.explanation,
                     "topic": q.topic,
-                    "exam_type": q.exam_type,
+                    "exam_type": models.EXAM_TYPE.from_id(q.exam_type).name,
                     "has_diagram": q.has_diagram,
-                    "subject": q.subject,
+                    "subject": models.SUBJECT.from_id(q.subject).name,
                     "year": q.year,
-                    "exam_stage": q.exam_stage,
-                    "difficulty_level": q.difficulty_level
+                    "exam_stage": models.EXAM_STAGE.from_id(q.exam_stage).name,
+                    "difficulty_level": models.DIFFICULTY_LEVEL.from_id(q.difficulty_level).name if q.difficulty_level else None
                 }
                 questions_list.append(question_dict)
             
@@ -699,11 +726,52 @@ app.include_router(question_router)
 app.include_router(auth_router)
 app.include_router(questions_router)
 
+async def refresh_question_statistics_periodically():
+    # Held open for the lock's lifetime; AUTOCOMMIT keeps it from idling in a transaction
+    lock_conn = None
+    is_refresher = False
+    try:
+        while True:
+            await asyncio.sleep(QUESTION_STATS_REFRESH_SECONDS)
+            try:
+                if lock_conn is None:
+                    lock_conn = await asyncio.to_thread(
+                        lambda: engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+                    )
+                if not is_refresher:
+                    is_refresher = await asyncio.to_thread(try_acquire_question_statistics_lock, lock_conn)
+                if is_refresher:
+                    await asyncio.to_thread(refresh_question_statistics)
+            except Exception as e:
+                logger.error(f"Error in refresh_question_statistics: {str(e)}")
+                # Release the lock so another worker can take over
+                if lock_conn is not None:
+                    lock_conn.close()
+                lock_conn = None
+                is_refresher = False
+    finally:
+        if lock_conn is not None:
+            lock_conn.close()
+
 # Event handler for startup
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    # Validate and log the bcrypt cost now that .env and logging are loaded;
+    # an invalid BCRYPT_ROUNDS aborts startup
+    models.get_bcrypt_rounds()
+    # Keep a reference so the task is not garbage-collected while running
+    app.state.stats_refresh_task = asyncio.create_task(refresh_question_statistics_periodically())
     logger.info("Application startup complete")
 
+# Event handler for shutdown
+@app.on_event("shutdown")
+async def on_shutdown():
+    app.state.stats_refresh_task.cancel()
+    try:
+        await app.state.stats_refresh_task
+    except asyncio.CancelledError:
+        pass
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,26 +1,75 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Float, Boolean
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, DateTime, ForeignKey, Enum, Float, Boolean, CHAR, Index, UniqueConstraint
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from database import Base
-from passlib.context import CryptContext
+import bcrypt
+import asyncio
 import logging
+import os
 import enum
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional, List
 
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=1)
+def get_bcrypt_rounds() -> int:
+    """bcrypt work factor (2^rounds iterations); 12 matches the passlib default.
+
+    Read lazily so .env applies; main.py calls this at startup to validate and log it.
+    """
+    rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    if not 4 <= rounds <= 31:
+        raise ValueError(f"BCRYPT_ROUNDS must be between 4 and 31, got {rounds}")
+    logger.info("Using bcrypt cost factor %s", rounds)
+    return rounds
+
+# bcrypt only consumes the first 72 bytes; passlib truncated silently as well
+BCRYPT_MAX_BYTES = 72
+
+@lru_cache(maxsize=1)
+def _bcrypt_pool() -> ThreadPoolExecutor:
+    """Bounded pool for bcrypt work; hashpw/checkpw release the GIL, so threads run in parallel"""
+    workers = int(os.getenv("BCRYPT_WORKERS", "0"))
+    if not workers:
+        # sched_getaffinity honours CPU pinning but only exists on Linux
+        if hasattr(os, "sched_getaffinity"):
+            workers = len(os.sched_getaffinity(0))
+        else:
+            workers = os.cpu_count() or 1
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(
+        _password_bytes(password), bcrypt.gensalt(rounds=get_bcrypt_rounds())
+    ).decode("utf-8")
+
+def check_password(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(_password_bytes(password), hashed_password.encode("utf-8"))
+
+def _hash_needs_update(hashed_password: str) -> bool:
+    """Check whether a stored $2b$NN$... hash was made with a lower cost than configured"""
+    rounds = get_bcrypt_rounds()
+    try:
+        return int(hashed_password.split("$")[2]) < rounds
+    except (IndexError, ValueError):
+        return False
 
 # Pydantic schemas
 class UserProgressSchema(BaseModel):
     id: int
     user_id: int
     question_id: int
-    correct: int  # Changed from is_correct to correct
-    time_taken: Optional[float] = None
+    is_correct: bool
+    time_taken: Optional[int] = None  # Milliseconds
     attempted_at: datetime
 
     class Config:
@@ -80,7 +129,7 @@ class QuestionStatisticsSchema(BaseModel):
     question_id: int
     total_attempts: int
     correct_attempts: int
-    average_time: float
+    average_time: int  # Milliseconds
     last_updated: datetime
 
     class Config:
@@ -150,6 +199,45 @@ class DifficultyLevel(enum.Enum):
     MODERATE = "Moderate"
     HARD = "Hard"
 
+class SmallIntEnum(TypeDecorator):
+    """Store an enum.Enum as its 1-based definition ordinal in a SMALLINT column.
+
+    Binds accept a member, its name or its value; results come back as members.
+    Ordinals follow declaration order, so new members must only be appended.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enum_class = enum_class
+        self._by_id = dict(enumerate(enum_class, start=1))
+        self._ids = {}
+        for member_id, member in self._by_id.items():
+            self._ids[member] = member_id
+            self._ids[member.name] = member_id
+            self._ids[member.value] = member_id
+
+    def to_id(self, value) -> int:
+        try:
+            return self._ids[value]
+        except KeyError:
+            raise ValueError(f"{value!r} is not a valid {self.enum_class.__name__}")
+
+    def from_id(self, member_id: int):
+        return self._by_id[member_id]
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.to_id(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self._by_id[value]
+
+EXAM_TYPE = SmallIntEnum(ExamType)
+EXAM_STAGE = SmallIntEnum(ExamStage)
+SUBJECT = SmallIntEnum(Subject)
+DIFFICULTY_LEVEL = SmallIntEnum(DifficultyLevel)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -167,26 +255,35 @@ class User(Base):
                 raise ValueError("Password cannot be empty")
             if len(password) < 6:
                 raise ValueError("Password must be at least 6 characters long")
-            self.hashed_password = pwd_context.hash(password)
+            self.hashed_password = hash_password(password)
             logger.info("Password hashed successfully")
         except Exception as e:
-            logger.error(f"Error hashing password: {str(e)}")
+            logger.error("Error hashing password: %s", e)
             raise ValueError(f"Error hashing password: {str(e)}")
 
     def verify_password(self, password: str) -> bool:
-        """Verify the user's password"""
+        """Verify the user's password, rehashing it if the stored cost is outdated"""
         try:
             if not password or not self.hashed_password:
                 logger.warning("Password or hashed_password is empty")
                 return False
-            is_valid = pwd_context.verify(password, self.hashed_password)
+            is_valid = check_password(password, self.hashed_password)
             if not is_valid:
                 logger.warning("Invalid password")
+            elif _hash_needs_update(self.hashed_password):
+                # Upgrade to the configured cost; the caller commits the session
+                self.hashed_password = hash_password(password)
+                logger.info("Password rehashed with updated cost factor")
             return is_valid
         except Exception as e:
-            logger.error(f"Error verifying password: {str(e)}")
+            logger.error("Error verifying password: %s", e)
             return False
 
+    async def verify_password_async(self, password: str) -> bool:
+        """Run verify_password in the bcrypt thread pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_bcrypt_pool(), self.verify_password, password)
+
     def to_schema(self):
         return UserSchema(
             id=self.id,
@@ -205,7 +302,7 @@ class Question(Base):
     option_b = Column(Text, nullable=False)
     option_c = Column(Text, nullable=False)
     option_d = Column(Text, nullable=False)
-    correct_answer = Column(String(1), nullable=False)  # A, B, C, or D
+    correct_answer = Column(CHAR(1), nullable=False)  # A, B, C, or D
     explanation = Column(Text)
     
     # Diagram/Image related fields
@@ -214,13 +311,41 @@ class Question(Base):
     
     # Metadata
     year = Column(Integer, nullable=False)
-    exam_type = Column(Enum(ExamType), nullable=False)
-    exam_stage = Column(Enum(ExamStage), nullable=False)
-    subject = Column(Enum(Subject), nullable=False)
+    exam_type = Column(EXAM_TYPE, nullable=False)
+    exam_stage = Column(EXAM_STAGE, nullable=False)
+    subject = Column(SUBJECT, nullable=False)
     topic = Column(String(100))  # Optional topic within subject
     
     # Additional metadata
-    difficulty_level = Column(Enum(DifficultyLevel), default=DifficultyLevel.MODERATE)
+    difficulty_level = Column(DIFFICULTY_LEVEL, default=DifficultyLevel.MODERATE)
     source = Column(String(255))  # Source of the question (e.g., "Previous Year Paper", "Practice Set")
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Naive UTC, as previously written by datetime.utcnow()
+    created_at = Column(DateTime, server_default=func.timezone("utc", func.now()))
+    updated_at = Column(
+        DateTime, server_default=func.timezone("utc", func.now()), onupdate=func.timezone("utc", func.now())
+    )
+
+    __table_args__ = (
+        # Covering indexes for the exam/subject/year filters; INCLUDE lets answer-key
+        # lookups be served as index-only scans (Postgres 11+)
+        Index(
+            "ix_q_exam_subj_year", "exam_type", "exam_stage", "subject", "year",
+            postgresql_include=["correct_answer", "difficulty_level"]
+        ),
+        Index("ix_q_subject_year", "subject", "year"),
+    )
+
+class UserProgress(Base):
+    __tablename__ = "user_progress"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    is_correct = Column(Boolean, nullable=False)
+    time_taken = Column(Integer)  # Milliseconds taken to answer
+    attempted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # One row per user/question; backs the "already answered?" lookup and upserts
+        UniqueConstraint("user_id", "question_id", name="uq_user_q"),
+    )
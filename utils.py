@@ -1,9 +1,63 @@
-from passlib.context import CryptContext
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from typing import Iterable, Optional, Sequence
+import numpy as np
+from models import UserProgress
+# Password helpers live in models.py; re-exported for existing callers
+from models import hash_password as get_password_hash, check_password as verify_password
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+OPTION_LETTERS = frozenset("ABCD")
+# Placeholders that never equal a real option letter, so they always score as wrong
+MISSING_KEY = "?"
+UNANSWERED = "-"
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def _option_letter(answer: Optional[str], invalid: str) -> str:
+    letter = (answer or "").strip().upper()
+    return letter if letter in OPTION_LETTERS else invalid
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def answers_to_array(answers: Iterable[Optional[str]], invalid: str = UNANSWERED) -> np.ndarray:
+    """Pack option letters ('A'..'D') into a contiguous uint8 array of ASCII codes.
+
+    Anything else (empty, multi-letter, non-ASCII) becomes `invalid` and never scores.
+    """
+    packed = "".join(_option_letter(a, invalid) for a in answers)
+    return np.frombuffer(packed.encode("ascii"), dtype=np.uint8)
+
+def load_answer_key(db: Session, question_ids: Sequence[int]) -> np.ndarray:
+    """Fetch correct_answer for question_ids, in the same order, as a uint8 array"""
+    rows = db.execute(
+        text("SELECT id, correct_answer FROM questions WHERE id = ANY(:ids)"),
+        {"ids": list(question_ids)}
+    ).fetchall()
+    key = dict(rows)
+    return answers_to_array((key.get(qid) for qid in question_ids), invalid=MISSING_KEY)
+
+def score_batch(correct: np.ndarray, answers: np.ndarray) -> np.ndarray:
+    """Vectorized grading; returns a bool mask, use .sum() for the score"""
+    if correct.shape != answers.shape:
+        raise ValueError(f"Shape mismatch: {correct.shape} answer key vs {answers.shape} answers")
+    return correct == answers
+
+def upsert_user_progress(
+    db: Session, user_id: int, question_id: int, is_correct: bool, time_taken: Optional[float] = None
+):
+    """Record an attempt in one round-trip, overwriting any earlier attempt.
+
+    time_taken is in seconds and is stored as integer milliseconds.
+    """
+    stmt = insert(UserProgress).values(
+        user_id=user_id,
+        question_id=question_id,
+        is_correct=is_correct,
+        time_taken=None if time_taken is None else round(time_taken * 1000)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserProgress.user_id, UserProgress.question_id],
+        set_={
+            "is_correct": stmt.excluded.is_correct,
+            "time_taken": stmt.excluded.time_taken,
+            "attempted_at": func.now()
+        }
+    )
+    db.execute(stmt)